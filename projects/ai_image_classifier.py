@@ -4,31 +4,72 @@ A deep learning image classification system using Convolutional Neural Networks
 """
 
 import numpy as np
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional, Union
 from dataclasses import dataclass
 from datetime import datetime
 import json
+import time
+from functools import lru_cache
+
+import cv2
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Scale applied to the channel sum in CNNLayer.forward, shared with the fused kernel
+_REDUCTION_SCALE = np.float32(0.1)
+
+# Generator for sample inputs
+_rng = np.random.default_rng(42)
+
+# Seed for the shared model weights
+_WEIGHT_SEED = 0xC0FFEE
+
+# Inference weights shared across classifiers, keyed by (num_classes, input_channels)
+_WEIGHT_CACHE: Dict[Tuple[int, int], List[Tuple[np.ndarray, np.ndarray]]] = {}
+
+# Images pushed through the model together; bounds the per-layer intermediates
+_BATCH_CHUNK = 4
 
 @dataclass
 class Prediction:
     """Prediction result"""
     class_name: str
     confidence: float
-    timestamp: str
+    timestamp: int  # nanoseconds since the epoch, from time.time_ns()
+    
+    @property
+    def timestamp_iso(self) -> str:
+        """Timestamp formatted as an ISO 8601 string"""
+        return datetime.fromtimestamp(self.timestamp / 1e9).isoformat()
 
 class ImagePreprocessor:
     """Image preprocessing for neural network input"""
     
+    # Pixel types cv2.resize accepts with INTER_AREA
+    _RESIZE_DTYPES = (np.uint8, np.uint16, np.int16, np.float32, np.float64)
+    
     @staticmethod
     def normalize(image: np.ndarray) -> np.ndarray:
         """Normalize image to [0, 1] range"""
-        return image.astype(np.float32) / 255.0
+        out = np.empty(image.shape, dtype=np.float32)
+        np.multiply(image, np.float32(1.0 / 255.0), out=out, casting='unsafe')
+        return out
     
     @staticmethod
     def resize(image: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
         """Resize image to target size"""
-        # Simplified resize (in production, use proper interpolation)
-        return np.resize(image, (*size, image.shape[2] if len(image.shape) > 2 else 1))
+        if image.ndim == 2:
+            image = image[..., None]
+        if image.dtype not in ImagePreprocessor._RESIZE_DTYPES:
+            image = image.astype(np.float32)
+        
+        resized = cv2.resize(image, (size[1], size[0]), interpolation=cv2.INTER_AREA)
+        
+        # OpenCV drops a trailing single channel
+        return resized[..., None] if resized.ndim == 2 else resized
     
     @staticmethod
     def preprocess(image: np.ndarray, target_size: Tuple[int, int] = (224, 224)) -> np.ndarray:
@@ -40,97 +81,217 @@ class ImagePreprocessor:
 class CNNLayer:
     """Convolutional Neural Network Layer"""
     
-    def __init__(self, filters: int, kernel_size: int, activation: str = 'relu'):
+    def __init__(self, filters: int, kernel_size: int, activation: str = 'relu',
+                 in_channels: int = 3,
+                 seed: Optional[Union[int, np.random.Generator]] = None,
+                 weights: Optional[np.ndarray] = None, bias: Optional[np.ndarray] = None):
         self.filters = filters
         self.kernel_size = kernel_size
         self.activation = activation
-        self.weights = None
-        self.bias = None
+        self.in_channels = in_channels
         
+        if weights is None:
+            rng = np.random.default_rng(seed)
+            weights = rng.standard_normal(
+                (filters, in_channels, kernel_size, kernel_size), dtype=np.float32
+            ) * np.float32(0.1)
+        if bias is None:
+            bias = np.zeros(filters, dtype=np.float32)
+        self.weights = weights
+        self.bias = bias
+    
     def forward(self, x: np.ndarray) -> np.ndarray:
         """Forward pass through layer"""
         # Simplified convolution (in production, use proper conv2d)
-        if self.weights is None:
-            self.weights = np.random.randn(self.filters, x.shape[-1], 
-                                         self.kernel_size, self.kernel_size) * 0.1
-            self.bias = np.zeros(self.filters)
-        
-        # Simplified convolution operation
-        output = np.zeros((*x.shape[:-1], self.filters))
-        for i in range(self.filters):
-            output[..., i] = np.sum(x, axis=-1) * 0.1 + self.bias[i]
+        # Reduce channels once, broadcast over filters
+        reduced = np.sum(x, axis=-1, keepdims=True) * _REDUCTION_SCALE
+        reduced = reduced.astype(np.float32, copy=False)
+        output = reduced + self.bias
         
         if self.activation == 'relu':
             output = np.maximum(0, output)
         elif self.activation == 'softmax':
-            exp = np.exp(output - np.max(output, axis=-1, keepdims=True))
-            output = exp / np.sum(exp, axis=-1, keepdims=True)
+            # output is a fresh buffer, so normalize it in place
+            np.subtract(output, output.max(axis=-1, keepdims=True), out=output)
+            np.exp(output, out=output)
+            output /= output.sum(axis=-1, keepdims=True)
         
         return output
 
+# Activation codes understood by the fused kernel
+_ACTIVATION_CODES = {'relu': 0, 'softmax': 1}
+_LINEAR = 2
+
+def _cnn_stack(x: np.ndarray, biases: np.ndarray, offsets: np.ndarray,
+               activations: np.ndarray) -> np.ndarray:
+    """Run every CNNLayer.forward of a float32 model in one pass per pixel
+    
+    x holds one row of channels per pixel, biases is every layer's bias
+    concatenated, and layer l owns biases[offsets[l]:offsets[l + 1]].
+    """
+    n_layers = activations.shape[0]
+    width = 0
+    for l in range(n_layers):
+        width = max(width, offsets[l + 1] - offsets[l])
+    
+    out = np.empty((x.shape[0], offsets[n_layers] - offsets[n_layers - 1]),
+                   dtype=np.float32)
+    row = np.empty(width, dtype=np.float32)
+    for p in range(x.shape[0]):
+        s = np.float32(0)
+        for c in range(x.shape[1]):
+            s += x[p, c]
+        
+        for l in range(n_layers):
+            start = offsets[l]
+            filters = offsets[l + 1] - start
+            reduced = s * _REDUCTION_SCALE
+            for f in range(filters):
+                row[f] = reduced + biases[start + f]
+            
+            if activations[l] == 0:
+                for f in range(filters):
+                    row[f] = max(row[f], np.float32(0))
+            elif activations[l] == 1:
+                peak = row[0]
+                for f in range(1, filters):
+                    peak = max(peak, row[f])
+                total = np.float32(0)
+                for f in range(filters):
+                    row[f] = np.exp(row[f] - peak)
+                    total += row[f]
+                for f in range(filters):
+                    row[f] /= total
+            
+            # The next layer only consumes the channel sum of this one
+            s = np.float32(0)
+            for f in range(filters):
+                s += row[f]
+        
+        for f in range(out.shape[1]):
+            out[p, f] = row[f]
+    
+    return out
+
+@lru_cache(maxsize=None)
+def _fused_kernel():
+    """Compile _cnn_stack with Numba on first use, or None if that is not possible"""
+    if njit is None:
+        return None
+    
+    try:
+        return njit('float32[:, ::1](float32[:, ::1], float32[::1], int64[::1], int8[::1])',
+                    cache=True, fastmath=True)(_cnn_stack)
+    except Exception:
+        return None
+
 class AIImageClassifier:
     """AI Image Classifier using CNN"""
     
     def __init__(self, num_classes: int = 10):
         self.num_classes = num_classes
-        self.classes = [
+        self.classes = (
             'Airplane', 'Automobile', 'Bird', 'Cat', 'Deer',
             'Dog', 'Frog', 'Horse', 'Ship', 'Truck'
-        ]
+        )
         self.preprocessor = ImagePreprocessor()
         self.model = self._build_model()
+        self._fused = self._pack_fused_model()
         self.training_history = []
         
-    def _build_model(self) -> List[CNNLayer]:
+    def _build_model(self, input_channels: int = 3) -> List[CNNLayer]:
         """Build CNN model architecture"""
-        return [
-            CNNLayer(filters=32, kernel_size=3, activation='relu'),
-            CNNLayer(filters=64, kernel_size=3, activation='relu'),
-            CNNLayer(filters=128, kernel_size=3, activation='relu'),
-            CNNLayer(filters=self.num_classes, kernel_size=1, activation='softmax')
+        # (filters, kernel_size, activation, in_channels) per layer
+        architecture = [
+            (32, 3, 'relu', input_channels),
+            (64, 3, 'relu', 32),
+            (128, 3, 'relu', 64),
+            (self.num_classes, 1, 'softmax', 128)
         ]
-    
-    def predict(self, image: np.ndarray) -> Prediction:
-        """Predict class for an image"""
-        # Preprocess image
-        processed = self.preprocessor.preprocess(image)
         
-        # Forward pass through model
-        x = processed
-        for layer in self.model:
-            x = layer.forward(x)
+        # Weights are only read during inference, so classifiers with the same
+        # shape share them by reference instead of drawing them again
+        key = (self.num_classes, input_channels)
+        params = _WEIGHT_CACHE.get(key)
+        rng = np.random.default_rng(_WEIGHT_SEED)
         
-        # Get predictions
-        predictions = x.flatten() if x.ndim > 1 else x
-        predictions = predictions[:self.num_classes]
+        model = []
+        for i, (filters, kernel_size, activation, in_channels) in enumerate(architecture):
+            weights, bias = params[i] if params is not None else (None, None)
+            model.append(CNNLayer(filters=filters, kernel_size=kernel_size,
+                                  activation=activation, in_channels=in_channels,
+                                  seed=rng, weights=weights, bias=bias))
         
-        # Get top prediction
-        class_idx = np.argmax(predictions)
-        confidence = float(predictions[class_idx])
+        if params is None:
+            for layer in model:
+                layer.weights.setflags(write=False)
+                layer.bias.setflags(write=False)
+            _WEIGHT_CACHE[key] = [(layer.weights, layer.bias) for layer in model]
         
-        return Prediction(
-            class_name=self.classes[class_idx] if class_idx < len(self.classes) else 'Unknown',
-            confidence=confidence,
-            timestamp=datetime.now().isoformat()
-        )
+        return model
     
-    def predict_batch(self, images: List[np.ndarray]) -> List[Prediction]:
-        """Predict classes for multiple images"""
-        return [self.predict(img) for img in images]
+    def _pack_fused_model(self) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Pack layer parameters for the Numba kernel, if it can run this model"""
+        if _fused_kernel() is None:
+            return None
+        
+        biases = np.concatenate([layer.bias for layer in self.model]).astype(np.float32)
+        offsets = np.cumsum([0] + [layer.filters for layer in self.model]).astype(np.int64)
+        activations = np.array([_ACTIVATION_CODES.get(layer.activation, _LINEAR)
+                                for layer in self.model], dtype=np.int8)
+        return biases, offsets, activations
     
-    def get_top_predictions(self, image: np.ndarray, top_k: int = 5) -> List[Prediction]:
-        """Get top K predictions"""
-        processed = self.preprocessor.preprocess(image)
+    def _run_model(self, x: np.ndarray) -> np.ndarray:
+        """Run preprocessed input through every layer of the model"""
+        if self._fused is not None:
+            pixels = np.ascontiguousarray(x, dtype=np.float32).reshape(-1, x.shape[-1])
+            out = _fused_kernel()(pixels, *self._fused)
+            return out.reshape(*x.shape[:-1], out.shape[-1])
         
-        x = processed
         for layer in self.model:
             x = layer.forward(x)
+        return x
+    
+    def _forward(self, image: np.ndarray) -> np.ndarray:
+        """Preprocess an image and run it through the model"""
+        x = self._run_model(self.preprocessor.preprocess(image))
+        return x.reshape(-1)[:self.num_classes]
+    
+    def _forward_batch(self, images: List[np.ndarray]) -> np.ndarray:
+        """Preprocess a batch of images and run it through the model in chunks"""
+        processed = [self.preprocessor.preprocess(img) for img in images]
+        
+        # Only images with the same preprocessed shape (channel count) can be stacked
+        groups: Dict[Tuple[int, ...], List[int]] = {}
+        for i, x in enumerate(processed):
+            groups.setdefault(x.shape, []).append(i)
+        
+        predictions = np.empty((len(images), self.num_classes), dtype=np.float32)
+        for indices in groups.values():
+            for start in range(0, len(indices), _BATCH_CHUNK):
+                chunk = indices[start:start + _BATCH_CHUNK]
+                x = self._run_model(np.stack([processed[i] for i in chunk]))
+                predictions[chunk] = x.reshape(len(chunk), -1)[:, :self.num_classes]
         
-        predictions = x.flatten() if x.ndim > 1 else x
-        predictions = predictions[:self.num_classes]
+        return predictions
+    
+    def _topk(self, predictions: np.ndarray, top_k: int,
+              timestamp: Optional[int] = None) -> List[Prediction]:
+        """Build the top K predictions from a prediction vector"""
+        if top_k < 1:
+            raise ValueError(f"top_k must be at least 1, got {top_k}")
+        top_k = min(top_k, predictions.size)
+        
+        # Partition out the top K in O(C), then sort only those K by score and
+        # then by class index, both descending, so ties keep the baseline order.
+        # Partitioning the reversed scores keeps the highest indices when every
+        # class ties, as the untrained model's uniform softmax does.
+        reversed_top = np.argpartition(-predictions[::-1], top_k - 1)[:top_k]
+        candidates = predictions.size - 1 - reversed_top
+        top_indices = candidates[np.lexsort((-candidates, -predictions[candidates]))]
         
-        # Get top K indices
-        top_indices = np.argsort(predictions)[-top_k:][::-1]
+        if timestamp is None:
+            timestamp = time.time_ns()
         
         results = []
         for idx in top_indices:
@@ -138,14 +299,44 @@ class AIImageClassifier:
                 results.append(Prediction(
                     class_name=self.classes[idx],
                     confidence=float(predictions[idx]),
-                    timestamp=datetime.now().isoformat()
+                    timestamp=timestamp
                 ))
         
         return results
     
+    def _top1(self, predictions: np.ndarray,
+              timestamp: Optional[int] = None) -> Prediction:
+        """Build the top prediction from a prediction vector"""
+        class_idx = np.argmax(predictions)
+        confidence = float(predictions[class_idx])
+        
+        return Prediction(
+            class_name=self.classes[class_idx] if class_idx < len(self.classes) else 'Unknown',
+            confidence=confidence,
+            timestamp=time.time_ns() if timestamp is None else timestamp
+        )
+    
+    def predict(self, image: np.ndarray) -> Prediction:
+        """Predict class for an image"""
+        return self._top1(self._forward(image))
+    
+    def predict_batch(self, images: List[np.ndarray]) -> List[Prediction]:
+        """Predict classes for multiple images"""
+        if len(images) == 0:
+            return []
+        
+        timestamp = time.time_ns()
+        return [self._top1(predictions, timestamp)
+                for predictions in self._forward_batch(images)]
+    
+    def get_top_predictions(self, image: np.ndarray, top_k: int = 5) -> List[Prediction]:
+        """Get top K predictions"""
+        return self._topk(self._forward(image), top_k)
+    
     def analyze_image(self, image: np.ndarray) -> Dict:
         """Complete image analysis"""
-        top_predictions = self.get_top_predictions(image, top_k=3)
+        timestamp = time.time_ns()
+        top_predictions = self._topk(self._forward(image), top_k=3, timestamp=timestamp)
         
         return {
             'primary_prediction': {
@@ -161,12 +352,12 @@ class AIImageClassifier:
                 'architecture': 'CNN',
                 'layers': len(self.model)
             },
-            'timestamp': datetime.now().isoformat()
+            'timestamp': top_predictions[0].timestamp_iso
         }
 
 def generate_sample_image(shape: Tuple[int, int, int] = (224, 224, 3)) -> np.ndarray:
     """Generate a sample image for testing"""
-    return np.random.randint(0, 255, shape, dtype=np.uint8)
+    return _rng.integers(0, 255, shape, dtype=np.uint8)
 
 def main():
     """Main function to demonstrate the AI Image Classifier"""
@@ -4,9 +4,9 @@ A sophisticated stock market analysis tool using LSTM neural networks
 """
 
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
 from sklearn.preprocessing import MinMaxScaler
 from typing import Tuple, List
 
@@ -25,6 +25,8 @@ class StockPredictor:
         self.sequence_length = sequence_length
         self.scaler = MinMaxScaler(feature_range=(0, 1))
         self.model = None
+        self._inv_scale = None
+        self._inv_min = None
         
     def generate_sample_data(self, days: int = 1000) -> pd.DataFrame:
         """
@@ -39,24 +41,34 @@ class StockPredictor:
         dates = pd.date_range(start='2020-01-01', periods=days, freq='D')
         
         # Generate realistic stock price data with trend and volatility
-        np.random.seed(42)
+        rng = np.random.default_rng(42)
         base_price = 100
-        prices = []
-        current_price = base_price
+        floor_price = 10
         
-        for _ in range(days):
-            # Random walk with slight upward trend
-            change = np.random.normal(0.1, 2)
-            current_price = max(10, current_price + change)
-            prices.append(current_price)
+        # Random walk with slight upward trend, clamped at floor_price. Adding
+        # the running maximum shortfall below the floor reproduces the
+        # step-by-step max(floor, price + change) recurrence exactly. Everything
+        # is computed in place in the drawn float64 buffer plus one scratch array.
+        prices = rng.normal(0.1, 2, days)
+        np.cumsum(prices, out=prices)
+        prices += base_price
+        shortfall = np.subtract(floor_price, prices)
+        np.maximum.accumulate(shortfall, out=shortfall)
+        np.maximum(shortfall, 0, out=shortfall)
+        prices += shortfall
+        
+        # Derive OHLC columns from the walk in bulk, one array per column
+        high_noise = np.abs(rng.normal(0, 0.02, days))
+        low_noise = np.abs(rng.normal(0, 0.02, days))
+        close_noise = rng.normal(0, 0.01, days)
         
         df = pd.DataFrame({
             'Date': dates,
             'Open': prices,
-            'High': [p * (1 + abs(np.random.normal(0, 0.02))) for p in prices],
-            'Low': [p * (1 - abs(np.random.normal(0, 0.02))) for p in prices],
-            'Close': [p * (1 + np.random.normal(0, 0.01)) for p in prices],
-            'Volume': np.random.randint(1000000, 10000000, days)
+            'High': prices * (1 + high_noise),
+            'Low': prices * (1 - low_noise),
+            'Close': prices * (1 + close_noise),
+            'Volume': rng.integers(1000000, 10000000, days)
         })
         
         return df
@@ -69,20 +81,29 @@ class StockPredictor:
             df: DataFrame with stock data
             
         Returns:
-            X (features) and y (targets) arrays
+            X (features) and y (targets) arrays. X is a read-only sliding-window
+            view of the scaled series; copy it before modifying it.
         """
         # Use closing prices
         prices = df['Close'].values.reshape(-1, 1)
         
-        # Scale the data
-        scaled_prices = self.scaler.fit_transform(prices)
+        # Scale the data; float32 is plenty for the weighted-average model
+        scaled_prices = self.scaler.fit_transform(prices).astype(np.float32, copy=False)
+        
+        # MinMaxScaler is x * scale_ + min_; keep the inverse affine as plain floats
+        self._inv_scale = 1.0 / float(self.scaler.scale_[0])
+        self._inv_min = float(self.scaler.min_[0])
         
-        X, y = [], []
-        for i in range(self.sequence_length, len(scaled_prices)):
-            X.append(scaled_prices[i-self.sequence_length:i, 0])
-            y.append(scaled_prices[i, 0])
+        # Each window of sequence_length days predicts the following day
+        series = scaled_prices[:, 0]
+        if len(series) <= self.sequence_length:
+            return (np.empty((0, self.sequence_length), dtype=np.float32),
+                    np.empty(0, dtype=np.float32))
         
-        return np.array(X), np.array(y)
+        X = sliding_window_view(series, self.sequence_length)[:-1]
+        y = series[self.sequence_length:]
+        
+        return X, y
     
     def create_lstm_model(self, input_shape: Tuple) -> object:
         """
@@ -122,15 +143,10 @@ class StockPredictor:
         Returns:
             Predicted values
         """
-        # Simplified prediction using moving average
-        predictions = []
-        for sequence in data:
-            # Use weighted average of recent values
-            weights = np.linspace(0.1, 1.0, len(sequence))
-            prediction = np.average(sequence, weights=weights)
-            predictions.append(prediction)
-        
-        return np.array(predictions)
+        # Simplified prediction using a weighted average of recent values,
+        # computed for every sequence at once
+        weights = np.linspace(0.1, 1.0, data.shape[1], dtype=data.dtype)
+        return data @ weights / weights.sum()
     
     def visualize_predictions(self, actual: np.ndarray, predicted: np.ndarray, 
                             dates: pd.DatetimeIndex):
@@ -142,6 +158,12 @@ class StockPredictor:
             predicted: Predicted stock prices
             dates: Date range for plotting
         """
+        # Imported lazily; the chart is only ever written to disk, so use the
+        # non-interactive Agg backend
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        
         plt.figure(figsize=(12, 6))
         plt.plot(dates[-len(actual):], actual, label='Actual Price', linewidth=2)
         plt.plot(dates[-len(predicted):], predicted, label='Predicted Price', 
@@ -190,15 +212,15 @@ class StockPredictor:
         predictions = self.predict(X_test)
         
         # Inverse transform to get actual prices
-        y_test_actual = self.scaler.inverse_transform(y_test.reshape(-1, 1)).flatten()
-        predictions_actual = self.scaler.inverse_transform(
-            predictions.reshape(-1, 1)
-        ).flatten()
+        y_test_actual = (y_test - self._inv_min) * self._inv_scale
+        predictions_actual = (predictions - self._inv_min) * self._inv_scale
         
         # Calculate metrics
-        mse = np.mean((y_test_actual - predictions_actual) ** 2)
-        mae = np.mean(np.abs(y_test_actual - predictions_actual))
-        accuracy = 100 * (1 - mae / np.mean(y_test_actual))
+        # Compute the residuals once and reuse them for both error metrics
+        diff = np.subtract(y_test_actual, predictions_actual)
+        mse = float(np.einsum('i,i->', diff, diff) / diff.size)
+        mae = float(np.abs(diff).mean())
+        accuracy = 100.0 * (1.0 - mae / float(y_test_actual.mean()))
         
         print(f"\nPrediction Metrics:")
         print(f"  Mean Squared Error: ${mse:.2f}")
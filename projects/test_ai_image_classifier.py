@@ -0,0 +1,45 @@
+"""
+Tests for the AI Image Classifier
+"""
+
+import numpy as np
+import pytest
+
+from ai_image_classifier import (
+    AIImageClassifier, CNNLayer, _ACTIVATION_CODES, _LINEAR, _cnn_stack, _fused_kernel
+)
+
+# The pure-Python kernel, plus the compiled one when Numba can build it
+KERNELS = [
+    pytest.param(_cnn_stack, id='python'),
+    pytest.param(
+        _fused_kernel(), id='numba',
+        marks=pytest.mark.skipif(_fused_kernel() is None, reason='Numba unavailable')
+    ),
+]
+
+@pytest.mark.parametrize('kernel', KERNELS)
+@pytest.mark.parametrize('all_relu', [False, True], ids=['model', 'all-relu'])
+def test_cnn_stack_matches_layer_forward(kernel, all_relu):
+    """The fused kernel must compute exactly what CNNLayer.forward computes"""
+    model = AIImageClassifier().model
+    # A final softmax cancels the shared reduction term, so also probe with ReLU
+    # everywhere; non-zero biases make every step affect the result
+    names = ['relu'] * len(model) if all_relu else [layer.activation for layer in model]
+    offsets = np.cumsum([0] + [layer.filters for layer in model]).astype(np.int64)
+    biases = np.linspace(-0.5, 0.5, offsets[-1], dtype=np.float32)
+    activations = np.array([_ACTIVATION_CODES.get(name, _LINEAR) for name in names],
+                           dtype=np.int8)
+
+    rng = np.random.default_rng(0)
+    x = rng.random((16, model[0].in_channels), dtype=np.float32)
+
+    expected = x
+    for i, (layer, name) in enumerate(zip(model, names)):
+        expected = CNNLayer(filters=layer.filters, kernel_size=layer.kernel_size,
+                            activation=name, in_channels=layer.in_channels,
+                            weights=layer.weights,
+                            bias=biases[offsets[i]:offsets[i + 1]]).forward(expected)
+
+    np.testing.assert_allclose(kernel(x, biases, offsets, activations), expected,
+                               rtol=1e-4, atol=1e-6)